@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Parity check for batchCalculations.py
+Computes summary metrics for one surface of every rotationally symmetric type
+with batchCalculations.py and with calculateSurfaceMetrics() from
+src/utils/calculations.js (run under node), and fails if any metric differs.
+Zernike and Irregular surfaces must be reported as errors so the renderer
+falls back to JavaScript for them.
+
+Usage: python benchmarks/batch_parity_check.py
+"""
+
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+from batchCalculations import calculate_batch
+
+# Relative tolerance; both sides evaluate the same formulas in float64
+RELATIVE_TOLERANCE = 1e-9
+
+# Loads calculationsWrapper.js as a classic script and utils/calculations.js as
+# an ES module (copied next to a package.json with "type": "module")
+NODE_SCRIPT = r"""
+const fs = require('fs');
+const path = require('path');
+const { pathToFileURL } = require('url');
+const [srcDir, moduleDir] = process.argv.slice(1);
+const wrapper = fs.readFileSync(path.join(srcDir, 'calculationsWrapper.js'), 'utf-8');
+globalThis.window = { SurfaceCalculations: new Function(wrapper + '\nreturn SurfaceCalculations;')() };
+const surfaces = JSON.parse(fs.readFileSync(0, 'utf-8'));
+import(pathToFileURL(path.join(moduleDir, 'calculations.js')).href).then(({ calculateSurfaceMetrics }) => {
+    process.stdout.write(JSON.stringify(surfaces.map(s => calculateSurfaceMetrics(s))));
+});
+"""
+
+def surface(surface_type, **parameters):
+    parameters.setdefault('Min Height', 0)
+    parameters.setdefault('Step', 1)
+    return {'type': surface_type, 'parameters': {k: str(v) for k, v in parameters.items()}}
+
+SURFACES = [
+    surface('Sphere', **{'Radius': 100, 'Max Height': 20}),
+    surface('Sphere', **{'Radius': -60, 'Min Height': 5, 'Max Height': 25, 'Step': 0.5}),
+    surface('Even Asphere', **{'Radius': -100, 'Conic Constant': -0.5, 'A4': 1e-7, 'Max Height': 25}),
+    surface('Odd Asphere', **{'Radius': 100, 'Conic Constant': -1, 'A3': 1e-6, 'A5': -2e-9, 'Max Height': 25}),
+    surface('Opal Un U', **{'Radius': 100, 'e2': 0.8, 'H': 20, 'A2': 1e-3, 'A3': -2e-4, 'Max Height': 20}),
+    surface('Opal Un Z', **{'Radius': 100, 'e2': 0.8, 'H': 5, 'A3': 1e-4, 'A4': -1e-5, 'Max Height': 20}),
+    surface('Poly', **{'A1': 200, 'A2': -0.2, 'A3': 1e-3, 'Max Height': 20}),
+    surface('Zernike', **{'Radius': 100, 'Max Height': 20}),
+    surface('Irregular', **{'Radius': 100, 'Max Height': 20}),
+]
+
+def js_metrics(node, surfaces):
+    with tempfile.TemporaryDirectory() as module_dir:
+        for name in ("calculations.js", "numberParsing.js"):
+            shutil.copy(os.path.join(SRC_DIR, "utils", name), module_dir)
+        with open(os.path.join(module_dir, "package.json"), 'w') as f:
+            f.write('{"type": "module"}')
+        proc = subprocess.run([node, "-e", NODE_SCRIPT, SRC_DIR, module_dir],
+                              input=json.dumps(surfaces), capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip() or f"node exited with {proc.returncode}")
+    return json.loads(proc.stdout)
+
+def same(a, b):
+    # JSON has no NaN/Infinity; both sides report those as null
+    if a is None or b is None:
+        return a is None and b is None
+    return math.isclose(a, b, rel_tol=RELATIVE_TOLERANCE, abs_tol=1e-12)
+
+def main():
+    node = shutil.which("node")
+    if node is None:
+        print("SKIP  batch parity check: requires node")
+        return 0
+
+    expected = js_metrics(node, SURFACES)
+    actual = calculate_batch(SURFACES, workers=1)
+
+    failures = []
+    for item, js, py in zip(SURFACES, expected, actual):
+        name = item['type']
+        if name in ('Zernike', 'Irregular'):
+            problems = [] if 'error' in py else ["expected an error so the renderer falls back to JS"]
+        elif 'error' in py:
+            problems = [py['error']]
+        else:
+            problems = [f"{key} {py[key]!r}, JS {js[key]!r}" for key in py if not same(py[key], js[key])]
+        print(f"{'FAIL' if problems else 'OK':5} {name}")
+        failures.extend(f"{name}: {problem}" for problem in problems)
+
+    if failures:
+        for failure in failures:
+            print(f"ERROR: {failure}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
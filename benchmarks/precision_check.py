@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Precision check for the vectorized routines in calculations.py
+Evaluates the *_array sag and asphericity routines for positive and negative
+radii in every precision mode and compares them with an exact reference
+computed with the decimal module at 60 significant digits. Fails if an error
+is not covered by the returned error bound, or if the compensated mode is
+less accurate than plain float64 on any surface (beyond one ulp of the sag,
+the rounding of the value itself, which neither mode can go below).
+
+Usage: python benchmarks/precision_check.py
+"""
+
+import importlib.util
+import os
+import sys
+from decimal import Decimal, getcontext
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from calculations import PRECISION_MODES, SurfaceCalculations as sc
+
+# Far beyond float64, so the reference error is negligible; float inputs
+# convert to Decimal exactly
+getcontext().prec = 60
+REFERENCE_ERROR = Decimal("1e-40")
+
+# (name, kind, R, k, coefficients, max height); coefficients start at A4 for
+# even aspheres and at A3 for odd aspheres
+CASES = [
+    ("even R=+100", 'even', 100.0, -0.5, [1e-7], 25.0),
+    ("even R=-100", 'even', -100.0, -0.5, [1e-7], 25.0),
+    ("even R=-40 k=-1", 'even', -40.0, -1.0, [2e-6, -3e-9], 15.0),
+    ("odd R=+100", 'odd', 100.0, -0.5, [1e-6, 1e-7], 25.0),
+    ("odd R=-100", 'odd', -100.0, 0.3, [-1e-6, 1e-7], 25.0),
+    # Four alternating terms of a few hundred mm each at r = R, which cancel
+    # in plain float64 Horner evaluation
+    ("even R=50 4 terms", 'even', 50.0, -1.0, [3e-4, -2.4e-7, 8e-11, -1e-14], 50.0),
+    ("odd R=-50 4 terms", 'odd', -50.0, -1.0, [1e-3, -3e-5, 3e-7, -1e-9], 50.0),
+]
+
+def exact_sag(kind, r, R, k, coeffs):
+    r = Decimal(r)
+    c = 1 / Decimal(R)
+    z = c * r * r / (1 + (1 - (1 + Decimal(k)) * c * c * r * r).sqrt())
+    first, step = (4, 2) if kind == 'even' else (3, 1)
+    for i, a in enumerate(coeffs):
+        z += Decimal(a) * r ** (first + step * i)
+    return z
+
+def exact_asphericity(r, z, R3, R):
+    sign_r = 1 if R >= 0 else -1
+    R3 = Decimal(R3)
+    return sign_r * (abs(R3) - ((R3 - z) ** 2 + Decimal(r) ** 2).sqrt())
+
+def array_sag(kind, r, R, k, coeffs, precision):
+    routine = sc.calculate_even_asphere_sag_array if kind == 'even' else sc.calculate_odd_asphere_sag_array
+    return routine(r, R, k, *coeffs, precision=precision, return_error=True)
+
+def check_case(np, case, precision):
+    """Return (problems, max sag error, max asphericity error, sag ulp) for one case in one mode."""
+    name, kind, R, k, coeffs, max_height = case
+    radii = [max_height * i / 50 for i in range(51)]
+    r = np.array(radii)
+
+    expected_sag = [exact_sag(kind, x, R, k, coeffs) for x in radii]
+    R3 = sc.calculate_best_fit_sphere_radius_3_points(max_height, float(expected_sag[-1]))
+    expected_asph = [exact_asphericity(x, z, R3, R) for x, z in zip(radii, expected_sag)]
+
+    sag, sag_error = array_sag(kind, r, R, k, coeffs, precision)
+    asph, asph_error = sc.calculate_asphericity_for_r3_array(
+        r, sag, R3, R, precision=precision, return_error=True, z_error=sag_error)
+
+    problems = []
+    max_errors = []
+    for label, actual, bound, expected in (
+            ("sag", sag, sag_error, expected_sag),
+            ("asphericity", asph, asph_error, expected_asph)):
+        errors = [abs(Decimal(float(a)) - e) for a, e in zip(actual, expected)]
+        for i, (error, b) in enumerate(zip(errors, bound)):
+            if error > Decimal(float(b)) + REFERENCE_ERROR:
+                problems.append(f"{name} {label}: {float(actual[i]):.6e} at r={radii[i]}, "
+                                f"exact {float(expected[i]):.6e}, error {float(error):.3e} "
+                                f"exceeds bound {float(b):.3e}")
+                break
+        max_errors.append(max(errors))
+    sag_ulp = Decimal(float(np.spacing(max(abs(float(z)) for z in expected_sag))))
+    return problems, max_errors[0], max_errors[1], sag_ulp
+
+def main():
+    if importlib.util.find_spec("numpy") is None:
+        print("SKIP  precision check: requires numpy")
+        return 0
+    import numpy as np
+
+    failures = []
+    max_errors = {}
+    for precision in PRECISION_MODES:
+        problems = []
+        for case in CASES:
+            case_problems, sag_error, asph_error, sag_ulp = check_case(np, case, precision)
+            problems.extend(case_problems)
+            max_errors[precision, case[0]] = (sag_error, asph_error, sag_ulp)
+        print(f"{'FAIL' if problems else 'OK':5} {precision}: {len(CASES)} surfaces within error bounds")
+        failures.extend(f"{precision}: {problem}" for problem in problems)
+
+    for case in CASES:
+        name = case[0]
+        plain = max_errors['float64', name]
+        compensated = max_errors['compensated', name]
+        sag_ulp = plain[2]
+        worse = [label for label, p, c in zip(("sag", "asphericity"), plain, compensated) if c > p + sag_ulp]
+        print(f"{'FAIL' if worse else 'OK':5} {name}: max sag error float64 {float(plain[0]):.1e}, "
+              f"compensated {float(compensated[0]):.1e}")
+        failures.extend(f"{name}: compensated {label} error exceeds float64" for label in worse)
+
+    if failures:
+        for failure in failures:
+            print(f"ERROR: {failure}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for surfaceFitter.py
+Runs the fitter under `python -X importtime` for the scenarios listed in
+startup_budget.json and fails if the median import time exceeds the budget, a
+forbidden (heavy) module is imported on that code path, or the fitter does not
+exit with the expected return code and output line.
+
+Usage: python benchmarks/startup_importtime.py [--update] [--warn-timing]
+  --update       rewrite each budget to twice the measured median
+  --warn-timing  report budget overruns as warnings (for shared CI runners);
+                 forbidden imports and wrong exit codes still fail
+"""
+
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BUDGET_FILE = os.path.join(BENCH_DIR, "startup_budget.json")
+FITTER_SCRIPT = os.path.join(BENCH_DIR, "..", "src", "surfaceFitter.py")
+
+def write_sample_data(filename):
+    # Sphere R=50 sampled over 0..10 mm
+    with open(filename, 'w') as f:
+        for i in range(201):
+            r = i * 0.05
+            z = r * r / (50 + (50 * 50 - r * r) ** 0.5)
+            f.write(f"{r:.12e}\t{z:.12e}\n")
+
+def parse_importtime(stderr):
+    """Return (total self time in ms, set of imported top-level packages)."""
+    total_us = 0
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        total_us += int(self_us)
+        modules.add(name.strip().split('.')[0])
+    return total_us / 1000.0, modules
+
+def run_scenario(scenario):
+    """Run one scenario and return (total import ms, imported packages, problem or None)."""
+    with tempfile.TemporaryDirectory() as work_dir:
+        with open(os.path.join(work_dir, "ConvertSettings.txt"), 'w') as f:
+            f.write(scenario["settings"])
+        if scenario.get("write_data"):
+            write_sample_data(os.path.join(work_dir, "tempsurfacedata.txt"))
+        proc = subprocess.run([sys.executable, "-X", "importtime", FITTER_SCRIPT],
+                              cwd=work_dir, capture_output=True, text=True)
+    total_ms, modules = parse_importtime(proc.stderr)
+
+    # A crash or a wrong code path can be fast too; only time the intended one
+    problem = None
+    expected_code = scenario.get("expect_returncode", 0)
+    expected_output = scenario.get("expect_output")
+    if proc.returncode != expected_code:
+        problem = f"exit code {proc.returncode}, expected {expected_code}"
+    elif expected_output and expected_output not in proc.stdout.splitlines():
+        last_line = proc.stdout.strip().splitlines()[-1:] or ['<no output>']
+        problem = f"output '{last_line[0]}', expected '{expected_output}'"
+    return total_ms, modules, problem
+
+def main():
+    update = "--update" in sys.argv[1:]
+    warn_timing = "--warn-timing" in sys.argv[1:]
+    with open(BUDGET_FILE, 'r') as f:
+        config = json.load(f)
+    repeats = config.get("repeats", 5)
+
+    failures = []
+    for name, scenario in config["scenarios"].items():
+        missing = [m for m in scenario.get("requires", []) if importlib.util.find_spec(m) is None]
+        if missing:
+            print(f"SKIP  {name}: requires {', '.join(missing)}")
+            continue
+
+        timings = []
+        modules = set()
+        problem = None
+        for _ in range(repeats):
+            total_ms, modules, problem = run_scenario(scenario)
+            if problem:
+                break
+            timings.append(total_ms)
+        if problem:
+            print(f"FAIL  {name}: {problem}")
+            failures.append(f"{name}: {problem}")
+            continue
+        median_ms = statistics.median(timings)
+        budget_ms = scenario["budget_ms"]
+        forbidden = sorted(modules.intersection(scenario.get("forbidden_modules", [])))
+
+        status = "OK"
+        if forbidden:
+            status = "FAIL"
+            failures.append(f"{name}: imports {', '.join(forbidden)}")
+        if median_ms > budget_ms and not update:
+            if warn_timing:
+                status = "WARN"
+            else:
+                status = "FAIL"
+                failures.append(f"{name}: {median_ms:.1f} ms exceeds budget {budget_ms} ms")
+        print(f"{status:5} {name}: median {median_ms:.1f} ms (budget {budget_ms} ms)")
+
+        if update:
+            scenario["budget_ms"] = max(1, round(2 * median_ms))
+
+    if update:
+        with open(BUDGET_FILE, 'w') as f:
+            json.dump(config, f, indent=2)
+            f.write("\n")
+        print(f"Updated budgets in {BUDGET_FILE}")
+
+    if failures:
+        for failure in failures:
+            print(f"ERROR: {failure}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
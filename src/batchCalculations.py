@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Batch Surface Metrics
+Computes summary metrics for many surfaces, in parallel worker processes when
+there is enough work, using the SurfaceCalculations routines from calculations.py
+
+Input (JSON, read from the file given as the first argument or from stdin):
+    {"surfaces": [{"type": "Even Asphere", "parameters": {"Radius": "100", ...}}, ...],
+     "workers": 0}
+Surfaces use the application format produced by ZMXParser.convertToAppSurface.
+
+Output (compact JSON on stdout):
+    {"success": true, "results": [{"maxSag": ..., ...} or {"error": "..."}, ...]}
+Results are in the same order as the input surfaces.
+"""
+
+import json
+import math
+import os
+import sys
+
+from calculations import SurfaceCalculations
+
+# Evaluating one sample radius takes about 15 us in-process, while starting a
+# worker with the spawn method used on Windows takes about 110 ms (interpreter
+# plus imports). One worker is added per this many sample radii, so start-up
+# stays well below the work each worker takes over; a 100-surface ZMX import
+# at the default 1 mm step stays in-process.
+RADII_PER_WORKER = 20000
+
+def parse_number(value):
+    """Parse a parameter value the way numberParsing.js does (0 if invalid)."""
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        try:
+            number = float(str(value).strip().replace(',', '.'))
+        except ValueError:
+            return 0.0
+    return number if math.isfinite(number) else 0.0
+
+def make_sag_and_slope(surface_type, p):
+    """Return (sag(r), slope(r), R) callables for a rotationally symmetric surface."""
+    sc = SurfaceCalculations
+    if surface_type == 'Sphere':
+        R = p('Radius')
+        return (lambda r: sc.calculate_sphere_sag(r, R),
+                lambda r: sc.calculate_sphere_slope(r, R), R)
+    if surface_type == 'Even Asphere':
+        R = p('Radius')
+        args = [p('Conic Constant')] + [p(f'A{n}') for n in range(4, 21, 2)]
+        return (lambda r: sc.calculate_even_asphere_sag(r, R, *args),
+                lambda r: sc.calculate_even_asphere_slope(r, R, *args), R)
+    if surface_type == 'Odd Asphere':
+        R = p('Radius')
+        args = [p('Conic Constant')] + [p(f'A{n}') for n in range(3, 21)]
+        return (lambda r: sc.calculate_odd_asphere_sag(r, R, *args),
+                lambda r: sc.calculate_odd_asphere_slope(r, R, *args), R)
+    if surface_type == 'Opal Un U':
+        R = p('Radius')
+        args = [p('e2'), p('H')] + [p(f'A{n}') for n in range(2, 13)]
+        return (lambda r: sc.calculate_opal_un_u_sag(r, R, *args),
+                lambda r: sc.calculate_opal_un_u_slope(r, R, *args), R)
+    if surface_type == 'Opal Un Z':
+        R = p('Radius')
+        args = [p('e2'), p('H')] + [p(f'A{n}') for n in range(3, 14)]
+        return (lambda r: sc.calculate_opal_un_z_sag(r, R, *args),
+                lambda r: sc.calculate_opal_un_z_slope(r, R, *args), R)
+    if surface_type == 'Poly':
+        args = [p(f'A{n}') for n in range(1, 14)]
+        return (lambda r: sc.calculate_poly_sag(r, *args),
+                lambda r: sc.calculate_poly_slope(r, *args), args[0] / 2)
+    raise ValueError(f"Unsupported surface type: {surface_type}")
+
+def calculate_surface_metrics(surface):
+    """Python port of calculateSurfaceMetrics() in utils/calculations.js.
+
+    Only rotationally symmetric surface types are supported; Zernike and
+    Irregular surfaces are reported as errors so the caller can fall back to
+    the JavaScript implementation.
+    """
+    sc = SurfaceCalculations
+    parameters = surface.get('parameters', {})
+    p = lambda name: parse_number(parameters.get(name, 0))
+
+    sag_fn, slope_fn, R = make_sag_and_slope(surface.get('type'), p)
+    min_height = p('Min Height')
+    max_height = p('Max Height')
+    step = p('Step') or 1
+    if step < 0:
+        raise ValueError("Step must be positive")
+
+    # Same sampling as the JS summary: min..max by step, then max itself
+    radii = []
+    r = min_height
+    while r < max_height:
+        radii.append(r)
+        r += step
+    radii.append(max_height)
+
+    # Best fit sphere from the sag at the aperture limits
+    zmin = sag_fn(min_height)
+    zmax = sag_fn(max_height)
+    if min_height == 0:
+        R3 = sc.calculate_best_fit_sphere_radius_3_points(max_height, zmax)
+        best_fit_sphere = R3
+        asphericity_fn = lambda r, z: sc.calculate_asphericity_for_r3(r, z, R3, R)
+    else:
+        R4, zm, rm, g, Lz = sc.calculate_best_fit_sphere_radius_4_points(min_height, max_height, zmin, zmax)
+        best_fit_sphere = R4
+        asphericity_fn = lambda r, z: sc.calculate_asphericity_for_r4(r, z, R4, zm, rm, g, Lz)
+
+    max_sag = max_slope = max_angle = max_asphericity = max_aberration = 0.0
+    max_asph_gradient = 0.0
+    prev_r = prev_asph = None
+    edge_slope = 0.0
+    for r in radii:
+        # Like calculateSurfaceValues(), keep whatever was computed before a failure
+        sag = slope = asphericity = aberration = 0.0
+        try:
+            sag = sag_fn(r)
+            slope = slope_fn(r)
+            asphericity = asphericity_fn(r, sag)
+            aberration = sc.calculate_aberration_of_normals(sag, r, slope, R)
+        except (ValueError, ZeroDivisionError, OverflowError):
+            pass
+        angle = math.degrees(math.atan(slope))
+        edge_slope = slope
+
+        if math.isfinite(sag) and abs(sag) > abs(max_sag):
+            max_sag = sag
+        if math.isfinite(slope):
+            max_slope = max(max_slope, abs(slope))
+        if math.isfinite(angle):
+            max_angle = max(max_angle, abs(angle))
+        if math.isfinite(asphericity):
+            max_asphericity = max(max_asphericity, abs(asphericity))
+        if math.isfinite(aberration):
+            max_aberration = max(max_aberration, abs(aberration))
+
+        if prev_r is not None and r != prev_r:
+            gradient = abs(asphericity - prev_asph) / (r - prev_r)
+            if math.isfinite(gradient) and gradient > max_asph_gradient:
+                max_asph_gradient = gradient
+        prev_r, prev_asph = r, asphericity
+
+    paraxial_f_num = abs(R / (4 * max_height)) if R != 0 and max_height != 0 else 0.0
+    reflected_ray_angle = 2 * math.atan(abs(edge_slope))
+    working_f_num = 1 / (2 * math.sin(reflected_ray_angle)) if reflected_ray_angle != 0 else 0.0
+
+    return {
+        'maxSag': max_sag,
+        'maxSlope': max_slope,
+        'maxAngle': max_angle,
+        'maxAsphericity': max_asphericity,
+        'maxAberration': max_aberration,
+        'maxAsphGradient': max_asph_gradient,
+        'bestFitSphere': best_fit_sphere,
+        'paraxialFNum': paraxial_f_num,
+        'workingFNum': working_f_num
+    }
+
+def sample_count(surface):
+    """Number of radii calculate_surface_metrics() evaluates for a surface."""
+    try:
+        parameters = surface.get('parameters', {})
+        min_height = parse_number(parameters.get('Min Height', 0))
+        max_height = parse_number(parameters.get('Max Height', 0))
+        step = parse_number(parameters.get('Step', 0)) or 1
+    except AttributeError:
+        return 1
+    if step < 0 or max_height <= min_height:
+        return 1
+    return int((max_height - min_height) / step) + 2
+
+def _evaluate(surface):
+    # Worker entry point: never raise, so one bad surface does not fail the batch
+    try:
+        return calculate_surface_metrics(surface)
+    except Exception as e:
+        return {'error': str(e)}
+
+def calculate_batch(surfaces, workers=0):
+    """Compute metrics for all surfaces, in parallel when there is enough work.
+
+    Args:
+        surfaces: List of surfaces in application format
+        workers: Maximum number of worker processes (0 = one per CPU)
+
+    Returns:
+        List of metric dicts (or {'error': ...}) in input order
+    """
+    total_radii = sum(sample_count(surface) for surface in surfaces)
+    workers = min(workers or os.cpu_count() or 1, total_radii // RADII_PER_WORKER, len(surfaces))
+    if workers <= 1:
+        return [_evaluate(surface) for surface in surfaces]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunksize = max(1, len(surfaces) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_evaluate, surfaces, chunksize=chunksize))
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'r') as f:
+            request = json.load(f)
+    else:
+        request = json.load(sys.stdin)
+
+    surfaces = request.get('surfaces')
+    if not isinstance(surfaces, list):
+        print(json.dumps({'success': False, 'error': "Request must contain a 'surfaces' list"}))
+        return 1
+
+    results = calculate_batch(surfaces, int(request.get('workers', 0)))
+    # NaN/Infinity are not valid JSON; report them as null
+    for result in results:
+        for key, value in result.items():
+            if isinstance(value, float) and not math.isfinite(value):
+                result[key] = None
+    sys.stdout.write(json.dumps({'success': True, 'results': results}, separators=(',', ':')))
+    return 0
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': str(e)}))
+        sys.exit(1)
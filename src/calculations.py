@@ -1,21 +1,167 @@
 import math
 
+# Vectorized (*_array) routines exist only for even/odd asphere sag and 3-point
+# asphericity; they are not called by the app yet. Precision modes:
+#   float32      - single precision, fast previews
+#   float64      - double precision (default)
+#   compensated  - double precision with error-free transformations
+#                  (compensated Horner and exact products/sums), about as
+#                  accurate as evaluating in twice the working precision
+PRECISION_MODES = ('float32', 'float64', 'compensated')
+
+def _working_dtype(precision):
+    import numpy as np
+    if precision not in PRECISION_MODES:
+        raise ValueError(f"Unknown precision mode: {precision}")
+    return np.float32 if precision == 'float32' else np.float64
+
+def _gamma(n, u):
+    """Classic rounding error constant gamma_n = n*u / (1 - n*u)"""
+    return n * u / (1 - n * u)
+
+def _two_sum(a, b):
+    """Error-free transformation: a + b = s + e exactly (Knuth)"""
+    s = a + b
+    bb = s - a
+    e = (a - (s - bb)) + (b - bb)
+    return s, e
+
+def _split(a):
+    """Split a into high and low halves with non-overlapping mantissas (Dekker)"""
+    import numpy as np
+    factor = 4097.0 if a.dtype == np.float32 else 134217729.0  # 2^12+1 / 2^27+1
+    c = a.dtype.type(factor) * a
+    hi = c - (c - a)
+    return hi, a - hi
+
+def _two_prod(a, b):
+    """Error-free transformation: a * b = p + e exactly (Dekker)"""
+    p = a * b
+    a_hi, a_lo = _split(a)
+    b_hi, b_lo = _split(b)
+    e = a_lo * b_lo - (((p - a_hi * b_hi) - a_lo * b_hi) - a_hi * b_lo)
+    return p, e
+
+def _horner(coeffs, x, compensated):
+    """Evaluate sum(coeffs[i] * x**i) with (compensated) Horner's method.
+
+    Returns (value, abs_bound) where abs_bound = sum(|coeffs[i]| * |x|**i) is
+    the condition-number term used by the error estimates.
+    """
+    import numpy as np
+    value = np.full_like(x, coeffs[-1])
+    correction = np.zeros_like(x)
+    abs_x = np.abs(x)
+    abs_bound = np.full_like(x, abs(coeffs[-1]))
+    for coeff in coeffs[-2::-1]:
+        coeff = x.dtype.type(coeff)
+        abs_bound = abs_bound * abs_x + abs(coeff)
+        if compensated:
+            p, pi = _two_prod(value, x)
+            value, sigma = _two_sum(p, coeff)
+            correction = correction * x + (pi + sigma)
+        else:
+            value = value * x + coeff
+    if compensated:
+        value = value + correction
+    return value, abs_bound
+
+def _conic_base_sag_array(r, R, k, precision):
+    """Vectorized conic base sag r^2 / (R * (1 + sqrt(1 - (1+k) r^2/R^2))).
+
+    Returns (sag, abs_error_estimate); points outside the conic return 0.
+    """
+    import numpy as np
+    dtype = _working_dtype(precision)
+    u = np.finfo(dtype).eps / 2
+    R = dtype(R)
+    if precision == 'compensated':
+        # Form x = (1+k) r^2 / R^2 in double-double so that 1 - x only
+        # carries the final rounding, even when x is close to 1
+        ones = np.ones_like(r)
+        kp, kp_err = _two_sum(ones, np.full_like(r, k))
+        r2, r2_err = _two_prod(r, r)
+        num, num_err = _two_prod(kp, r2)
+        num_err = num_err + (kp * r2_err + kp_err * r2)
+        den, den_err = _two_prod(np.full_like(r, R), np.full_like(r, R))
+        x = num / den
+        p, p_err = _two_prod(x, den)
+        x_err = ((num - p) - p_err + num_err - x * den_err) / den
+        d, d_err = _two_sum(ones, -x)
+        d = d + (d_err - x_err)
+        r2 = r2 + r2_err
+        d_abs_err = u * np.abs(d) + _gamma(8, u) * u * np.abs(x)
+    else:
+        r2 = r * r
+        x = dtype(1 + k) * r2 / (R * R)
+        d = 1 - x
+        d_abs_err = u * np.abs(d) + _gamma(4, u) * np.abs(x)
+    valid = d >= 0
+    root = np.sqrt(np.where(valid, d, 0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sag = r2 / (R * (1 + root))
+        # |sqrt(d + dd) - sqrt(d)| <= min(dd / (2 sqrt(d)), sqrt(dd))
+        root_err = np.minimum(d_abs_err / (2 * root), np.sqrt(d_abs_err)) + u * root
+        rel_err = _gamma(3, u) + root_err / (1 + root)
+    valid &= np.isfinite(sag)
+    sag = np.where(valid, sag, 0)
+    error = np.where(valid, np.abs(sag) * rel_err, 0)
+    return sag, error
+
+def _asphere_sag_array(r, R, k, poly_coeffs, precision, return_error, even=False):
+    """Conic base sag plus sum(poly_coeffs[i] * r**i) for an array of r.
+
+    Even polynomials are evaluated in r^2 in the plain modes (half the
+    Horner steps); compensated mode always works in r so the variable is exact.
+    """
+    import numpy as np
+    dtype = _working_dtype(precision)
+    u = np.finfo(dtype).eps / 2
+    compensated = precision == 'compensated'
+    r = np.asarray(r, dtype=dtype)
+
+    base, base_error = _conic_base_sag_array(r, R, k, precision)
+    if even and not compensated:
+        poly_coeffs = poly_coeffs[::2]
+        poly, abs_bound = _horner(poly_coeffs, r * r, False)
+        n = len(poly_coeffs) - 1
+        # Rounding of r^2 perturbs the variable by u, i.e. at most n*u*abs_bound
+        poly_error = (_gamma(2 * n, u) + n * u) * abs_bound
+    else:
+        poly, abs_bound = _horner(poly_coeffs, r, compensated)
+        n = len(poly_coeffs) - 1
+        if compensated:
+            poly_error = u * np.abs(poly) + _gamma(2 * n, u) ** 2 * abs_bound
+        else:
+            poly_error = _gamma(2 * n, u) * abs_bound
+
+    sag = base + poly
+    if not return_error:
+        return sag
+    return sag, base_error + poly_error + u * np.abs(sag)
+
 class SurfaceCalculations:
     """Python implementation of optical surface calculations"""
 
     @staticmethod
     def calculate_sphere_sag(r, R):
-        """Calculate sphere sag: z = r^2 / (2R)"""
+        """Calculate sphere sag: z = c*r^2 / (1 + sqrt(1 - c^2*r^2))"""
         if R == 0:
             return 0
-        return r * r / (2 * R)
+        c = 1.0 / R
+        r2 = r * r
+        return (c * r2) / (1.0 + math.sqrt(1.0 - c * c * r2))
 
     @staticmethod
     def calculate_sphere_slope(r, R):
-        """Calculate sphere slope: dz/dr = r / R"""
+        """Calculate sphere slope: dz/dr = c*r / sqrt(1 - c^2*r^2)"""
         if R == 0:
             return 0
-        return r / R
+        c = 1.0 / R
+        sqrt_term = math.sqrt(1.0 - c * c * r * r)
+        if sqrt_term == 0:
+            return 0
+        return (c * r) / sqrt_term
 
     @staticmethod
     def calculate_even_asphere_sag(r, R, k, A4, A6, A8, A10, A12, A14, A16, A18, A20):
@@ -211,22 +357,23 @@ class SurfaceCalculations:
         """Calculate Opal Un U slope"""
         z = SurfaceCalculations.calculate_opal_un_u_sag(r, R, e2, H, A2, A3, A4, A5, A6, A7, A8, A9, A10, A11, A12)
         r_squared = r * r
-        inv_r2 = 1.0 / (2 * R)
         w = r_squared / (H * H)
 
-        dQdr = 0
+        # dQ/dw for Q = A2*w^2 + A3*w^3 + ... + A12*w^12
+        dQdw = 0
         w_power = w
         coeffs = [A2, A3, A4, A5, A6, A7, A8, A9, A10, A11, A12]
-        for i in range(1, len(coeffs)):
-            dQdr += i * coeffs[i] * w_power
+        for i, coeff in enumerate(coeffs):
+            dQdw += (i + 2) * coeff * w_power
             w_power *= w
 
-        dQdr *= 2 * r / (H * H)
+        # Chain rule: dw/dr = 2r/H^2
+        dQdr = dQdw * 2 * r / (H * H)
 
         denominator = 1 - (1 - e2) * z / R
         if denominator == 0:
             return 0
-        return (r * inv_r2 + dQdr) / denominator
+        return (r / R + dQdr) / denominator
 
     @staticmethod
     def calculate_opal_un_z_slope(r, R, e2, H, A3, A4, A5, A6, A7, A8, A9, A10, A11, A12, A13):
@@ -300,6 +447,28 @@ class SurfaceCalculations:
             return 0
         return 2 * r / slope_denominator
 
+    @staticmethod
+    def calculate_even_asphere_sag_array(r, R, k, *coeffs, precision='float64', return_error=False):
+        """Calculate even asphere sag for an array of r (coeffs = A4, A6, ..., A20)
+
+        With return_error=True, returns (sag, error) where error is an
+        estimated bound on the absolute rounding error at each point.
+        """
+        poly_coeffs = [0.0] * (4 + 2 * len(coeffs) - 1)
+        for i, A in enumerate(coeffs):
+            poly_coeffs[4 + 2 * i] = A
+        return _asphere_sag_array(r, R, k, poly_coeffs, precision, return_error, even=True)
+
+    @staticmethod
+    def calculate_odd_asphere_sag_array(r, R, k, *coeffs, precision='float64', return_error=False):
+        """Calculate odd asphere sag for an array of r (coeffs = A3, A4, ..., A20)
+
+        With return_error=True, returns (sag, error) where error is an
+        estimated bound on the absolute rounding error at each point.
+        """
+        poly_coeffs = [0.0] * 3 + list(coeffs)
+        return _asphere_sag_array(r, R, k, poly_coeffs, precision, return_error)
+
     @staticmethod
     def calculate_best_fit_sphere_radius_3_points(max_r, zmax):
         """Calculate best fit sphere radius using 3 points (for surfaces without holes)"""
@@ -328,6 +497,54 @@ class SurfaceCalculations:
         except (ValueError, ZeroDivisionError):
             return 0
 
+    @staticmethod
+    def calculate_asphericity_for_r3_array(r, z, R3, R, precision='float64', return_error=False, z_error=None):
+        """Calculate asphericity against the 3-point best fit sphere for arrays of r, z
+
+        Uses |R3| - sqrt((R3 - z)^2 + r^2) = (2*R3*z - z^2 - r^2) / (|R3| + sqrt(...)),
+        which holds for either sign of R3, so the nearly equal square roots
+        are never subtracted. In compensated mode the numerator
+        is summed from exact products. z_error (e.g. from a *_sag_array
+        call) is propagated into the returned error estimate.
+        """
+        import numpy as np
+        dtype = _working_dtype(precision)
+        u = np.finfo(dtype).eps / 2
+        r = np.asarray(r, dtype=dtype)
+        z = np.asarray(z, dtype=dtype)
+        R3 = dtype(R3)
+        sign_r = 1 if R >= 0 else -1
+
+        # |R3|^2 - (R3 - z)^2 - r^2 = 2*R3*z - z^2 - r^2
+        two_r3z = 2 * R3 * z
+        z2 = z * z
+        r2 = r * r
+        if precision == 'compensated':
+            two_r3z, e1 = _two_prod(np.full_like(z, 2 * R3), z)
+            z2, e2 = _two_prod(z, z)
+            r2, e3 = _two_prod(r, r)
+            s, e4 = _two_sum(two_r3z, -z2)
+            numerator, e5 = _two_sum(s, -r2)
+            numerator = numerator + (e1 - e2 - e3 + e4 + e5)
+            numerator_error = u * np.abs(numerator) + _gamma(3, u) ** 2 * (np.abs(two_r3z) + z2 + r2)
+        else:
+            numerator = two_r3z - z2 - r2
+            numerator_error = _gamma(3, u) * (np.abs(two_r3z) + z2 + r2)
+
+        root = np.sqrt((R3 - z) ** 2 + r2)
+        denominator = np.abs(R3) + root
+        with np.errstate(divide='ignore', invalid='ignore'):
+            asphericity = sign_r * numerator / denominator
+            asphericity = np.where(np.isfinite(asphericity), asphericity, 0)
+            if not return_error:
+                return asphericity
+            error = numerator_error / denominator + 4 * u * np.abs(asphericity)
+            if z_error is not None:
+                # d(asph)/dz = (R3 - z) / root
+                error = error + np.abs((R3 - z) / root) * np.asarray(z_error, dtype=dtype)
+            error = np.where(np.isfinite(error), error, 0)
+        return asphericity, error
+
     @staticmethod
     def calculate_asphericity_for_r4(r, z, R4, zm, rm, g, Lz):
         """Calculate asphericity using best fit sphere with 4 points"""
@@ -1,10 +1,24 @@
 // ZMXImportDialog component - ZMX file import dialog with surface selection table
 
-const { useState } = React;
+import { calculateSurfaceMetricsBatch } from '../../utils/calculations.js';
+import { formatValue } from '../../utils/formatters.js';
+
+const { useState, useEffect } = React;
 const { createElement: h } = React;
 
 export const ZMXImportDialog = ({ zmxSurfaces, onImport, onClose, c, t }) => {
     const [selectedIndices, setSelectedIndices] = useState([]);
+    const [metrics, setMetrics] = useState(null);
+
+    // Summarize all surfaces in one batch (Python engine, JS fallback) without blocking the dialog
+    useEffect(() => {
+        let cancelled = false;
+        const appSurfaces = zmxSurfaces.map((surface, i) => window.ZMXParser.convertToAppSurface(surface, i, ''));
+        calculateSurfaceMetricsBatch(appSurfaces)
+            .then(results => { if (!cancelled) setMetrics(results); })
+            .catch(error => console.error('Failed to calculate ZMX surface metrics:', error));
+        return () => { cancelled = true; };
+    }, [zmxSurfaces]);
 
     const toggleSurface = (index) => {
         if (selectedIndices.includes(index)) {
@@ -49,7 +63,7 @@ export const ZMXImportDialog = ({ zmxSurfaces, onImport, onClose, c, t }) => {
                 backgroundColor: c.panel,
                 borderRadius: '8px',
                 padding: '24px',
-                width: '800px',
+                width: '960px',
                 maxHeight: '80vh',
                 display: 'flex',
                 flexDirection: 'column',
@@ -143,13 +157,16 @@ export const ZMXImportDialog = ({ zmxSurfaces, onImport, onClose, c, t }) => {
                             h('th', { style: { padding: '10px', textAlign: 'right', color: c.textDim } }, t.dialogs.zmxImport.radius),
                             h('th', { style: { padding: '10px', textAlign: 'right', color: c.textDim } }, t.dialogs.zmxImport.diameter),
                             h('th', { style: { padding: '10px', textAlign: 'right', color: c.textDim } }, t.dialogs.zmxImport.conic),
-                            h('th', { style: { padding: '10px', textAlign: 'center', color: c.textDim } }, t.dialogs.zmxImport.params)
+                            h('th', { style: { padding: '10px', textAlign: 'center', color: c.textDim } }, t.dialogs.zmxImport.params),
+                            h('th', { style: { padding: '10px', textAlign: 'right', color: c.textDim } }, t.dialogs.zmxImport.maxSag),
+                            h('th', { style: { padding: '10px', textAlign: 'right', color: c.textDim } }, t.dialogs.zmxImport.paraxialFNum)
                         )
                     ),
                     h('tbody', null,
                         zmxSurfaces.map((surface, index) => {
                             const summary = window.ZMXParser.getSurfaceSummary(surface);
                             const isSelected = selectedIndices.includes(index);
+                            const surfaceMetrics = metrics ? metrics[index] : null;
 
                             return h('tr', {
                                 key: index,
@@ -184,7 +201,11 @@ export const ZMXImportDialog = ({ zmxSurfaces, onImport, onClose, c, t }) => {
                                 h('td', { style: { padding: '10px', textAlign: 'right', fontFamily: 'monospace' } }, summary.radius),
                                 h('td', { style: { padding: '10px', textAlign: 'right', fontFamily: 'monospace' } }, summary.diameter),
                                 h('td', { style: { padding: '10px', textAlign: 'right', fontFamily: 'monospace' } }, summary.conic),
-                                h('td', { style: { padding: '10px', textAlign: 'center' } }, summary.parameterCount)
+                                h('td', { style: { padding: '10px', textAlign: 'center' } }, summary.parameterCount),
+                                h('td', { style: { padding: '10px', textAlign: 'right', fontFamily: 'monospace' } },
+                                    surfaceMetrics ? formatValue(surfaceMetrics.maxSag) : '…'),
+                                h('td', { style: { padding: '10px', textAlign: 'right', fontFamily: 'monospace' } },
+                                    surfaceMetrics ? formatValue(surfaceMetrics.paraxialFNum) : '…')
                             );
                         })
                     )
@@ -202,6 +202,8 @@ export const locales = {
         diameter: 'Diameter (mm)',
         conic: 'Conic',
         params: 'Params',
+        maxSag: 'Max Sag (mm)',
+        paraxialFNum: 'Paraxial F/#',
         errorNoSelection: 'Please select at least one surface to import'
       },
 
@@ -615,6 +617,8 @@ export const locales = {
         diameter: 'Диаметр (мм)',
         conic: 'Коника',
         params: 'Парам.',
+        maxSag: 'Макс. стрелка (мм)',
+        paraxialFNum: 'Параксиальное F/#',
         errorNoSelection: 'Пожалуйста, выберите хотя бы одну поверхность для импорта'
       },
 
@@ -593,6 +593,15 @@ function setupIpcHandlers() {
     return runConversionJs(surfaceData, settings);
   });
 
+  // Handler for computing metrics of many surfaces (e.g. a ZMX import) in the Python engine
+  ipcMain.handle('batch-calculate-surfaces', async (event, surfaces) => {
+    if (!Array.isArray(surfaces)) {
+      return { success: false, error: 'Expected an array of surfaces' };
+    }
+    log(`Running batch calculation for ${surfaces.length} surfaces`);
+    return runBatchCalculationPython(surfaces, userDataPath);
+  });
+
   // Handler for saving conversion results
   ipcMain.handle('save-conversion-results', async (event, folderName, surfaceName, results) => {
     const surfacesDir = path.join(__dirname, '..', 'surfaces');
@@ -734,8 +743,6 @@ async function runConversionJs(surfaceData, settings) {
 }
 
 function runConversionPython(surfaceData, settings, tempDir) {
-  const { spawn } = require('child_process');
-
   try {
     // Write surface data to temp file
     const dataContent = surfaceData.map(p => `${p.r}\t${p.z}`).join('\n');
@@ -745,80 +752,134 @@ function runConversionPython(surfaceData, settings, tempDir) {
     const settingsContent = Object.keys(settings).map(key => `${key}=${settings[key]}`).join('\n');
     fs.writeFileSync(path.join(tempDir, 'ConvertSettings.txt'), settingsContent);
 
-    const pythonPath = process.platform === 'win32' ? 'python' : 'python3';
+    // surfaceFitterCore.py is imported by surfaceFitter.py and must sit next to it
+    const scriptPath = resolvePythonScript(['surfaceFitter.py', 'surfaceFitterCore.py'], tempDir);
 
-    // Handle Python script path for asar packaging
-    let scriptPath;
-    if (app.isPackaged) {
-      const extractedScriptPath = path.join(tempDir, 'surfaceFitter.py');
-      const originalScriptPath = path.join(__dirname, 'surfaceFitter.py');
-      if (!fs.existsSync(extractedScriptPath)) {
-        fs.copyFileSync(originalScriptPath, extractedScriptPath);
+    return runPythonScript(scriptPath, tempDir).then(({ error, code, stdout, stderr }) => {
+      if (error) {
+        return buildPythonError(error);
+      }
+      if (code !== 0) {
+        return buildPythonError(stderr || `Exit code ${code}`, stdout);
       }
-      scriptPath = extractedScriptPath;
-    } else {
-      scriptPath = path.join(__dirname, 'surfaceFitter.py');
-    }
 
-    return new Promise((resolve) => {
-      let python;
       try {
-        python = spawn(pythonPath, [scriptPath], { cwd: tempDir });
-      } catch (spawnErr) {
-        resolve(buildPythonError(spawnErr.message));
-        return;
-      }
+        const fitReportPath = path.join(tempDir, 'FitReport.txt');
+        const fitReportContent = fs.readFileSync(fitReportPath, 'utf-8');
+        const fitReport = parseFitReport(fitReportContent);
+
+        const metricsPath = path.join(tempDir, 'FitMetrics.txt');
+        const metricsContent = fs.readFileSync(metricsPath, 'utf-8');
+        const metrics = parseMetrics(metricsContent);
+
+        const deviationsPath = path.join(tempDir, 'FitDeviations.txt');
+        const deviations = fs.readFileSync(deviationsPath, 'utf-8');
+
+        // Optional covariance/sensitivity analysis (FitAnalysis=0 disables it)
+        const analysisPath = path.join(tempDir, 'FitAnalysis.json');
+        let analysis = null;
+        if (fs.existsSync(analysisPath)) {
+          // The analysis is optional; a damaged file must not fail the fit
+          try {
+            analysis = JSON.parse(fs.readFileSync(analysisPath, 'utf-8'));
+          } catch (error) {
+            log(`Ignoring unreadable FitAnalysis.json: ${error.message}`);
+          }
+          fs.unlinkSync(analysisPath);
+        }
 
-      let stdout = '';
-      let stderr = '';
-      let resolved = false;
+        // Delete temporary files
+        fs.unlinkSync(path.join(tempDir, 'ConvertSettings.txt'));
+        fs.unlinkSync(fitReportPath);
+        fs.unlinkSync(metricsPath);
+        fs.unlinkSync(deviationsPath);
+        fs.unlinkSync(path.join(tempDir, 'tempsurfacedata.txt'));
 
-      python.on('error', (err) => {
-        if (resolved) return;
-        resolved = true;
-        resolve(buildPythonError(err.message));
-      });
+        return { success: true, fitReport, metrics, deviations, analysis, stdout };
+      } catch (error) {
+        return { success: false, error: `Failed to read Python fitter results: ${error.message}` };
+      }
+    });
+  } catch (error) {
+    return Promise.resolve({ success: false, error: error.message });
+  }
+}
 
-      python.stdout.on('data', (data) => { stdout += data.toString(); });
-      python.stderr.on('data', (data) => { stderr += data.toString(); });
+// Run batchCalculations.py on a list of app-format surfaces; metrics come back
+// in input order, with { error } entries for surfaces Python cannot evaluate
+function runBatchCalculationPython(surfaces, tempDir) {
+  let scriptPath;
+  try {
+    // calculations.py is imported by the batch script and must sit next to it
+    scriptPath = resolvePythonScript(['batchCalculations.py', 'calculations.py'], tempDir);
+  } catch (error) {
+    return Promise.resolve({ success: false, error: error.message });
+  }
 
-      python.on('close', (code) => {
-        if (resolved) return;
-        resolved = true;
+  return runPythonScript(scriptPath, tempDir, JSON.stringify({ surfaces })).then(({ error, code, stdout, stderr }) => {
+    if (error) {
+      return buildPythonError(error);
+    }
+    try {
+      return JSON.parse(stdout);
+    } catch (parseError) {
+      return buildPythonError(stderr || `Exit code ${code}`, stdout);
+    }
+  });
+}
 
-        if (code !== 0) {
-          resolve(buildPythonError(stderr || `Exit code ${code}`, stdout));
-          return;
-        }
+// Return the path of the first script in fileNames; in packaged builds the
+// scripts (and the modules they import) are copied out of the asar archive
+function resolvePythonScript(fileNames, tempDir) {
+  if (!app.isPackaged) {
+    return path.join(__dirname, fileNames[0]);
+  }
+  for (const fileName of fileNames) {
+    const extractedPath = path.join(tempDir, fileName);
+    if (!fs.existsSync(extractedPath)) {
+      fs.copyFileSync(path.join(__dirname, fileName), extractedPath);
+    }
+  }
+  return path.join(tempDir, fileNames[0]);
+}
 
-        try {
-          const fitReportPath = path.join(tempDir, 'FitReport.txt');
-          const fitReportContent = fs.readFileSync(fitReportPath, 'utf-8');
-          const fitReport = parseFitReport(fitReportContent);
+// Spawn a Python script in tempDir, optionally writing input to its stdin.
+// Resolves with { code, stdout, stderr }, or { error } if Python could not start.
+function runPythonScript(scriptPath, tempDir, input) {
+  const { spawn } = require('child_process');
+  const pythonPath = process.platform === 'win32' ? 'python' : 'python3';
 
-          const metricsPath = path.join(tempDir, 'FitMetrics.txt');
-          const metricsContent = fs.readFileSync(metricsPath, 'utf-8');
-          const metrics = parseMetrics(metricsContent);
+  return new Promise((resolve) => {
+    let python;
+    try {
+      python = spawn(pythonPath, [scriptPath], { cwd: tempDir });
+    } catch (spawnErr) {
+      resolve({ error: spawnErr.message });
+      return;
+    }
+
+    let stdout = '';
+    let stderr = '';
+    let resolved = false;
 
-          const deviationsPath = path.join(tempDir, 'FitDeviations.txt');
-          const deviations = fs.readFileSync(deviationsPath, 'utf-8');
+    python.on('error', (err) => {
+      if (resolved) return;
+      resolved = true;
+      resolve({ error: err.message });
+    });
 
-          // Delete temporary files
-          fs.unlinkSync(path.join(tempDir, 'ConvertSettings.txt'));
-          fs.unlinkSync(fitReportPath);
-          fs.unlinkSync(metricsPath);
-          fs.unlinkSync(deviationsPath);
-          fs.unlinkSync(path.join(tempDir, 'tempsurfacedata.txt'));
+    python.stdout.on('data', (data) => { stdout += data.toString(); });
+    python.stderr.on('data', (data) => { stderr += data.toString(); });
 
-          resolve({ success: true, fitReport, metrics, deviations, stdout });
-        } catch (error) {
-          resolve({ success: false, error: `Failed to read Python fitter results: ${error.message}` });
-        }
-      });
+    python.on('close', (code) => {
+      if (resolved) return;
+      resolved = true;
+      resolve({ code, stdout, stderr });
     });
-  } catch (error) {
-    return Promise.resolve({ success: false, error: error.message });
-  }
+
+    python.stdin.on('error', () => { /* reported through 'error'/'close' */ });
+    python.stdin.end(input);
+  });
 }
 
 // Build a friendly error when the Python fitter cannot run
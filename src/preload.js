@@ -6,6 +6,7 @@ contextBridge.exposeInMainWorld('electronAPI', {
   onMenuAction: (callback) => ipcRenderer.on('menu-action', (event, action) => callback(action)),
   openZMXDialog: () => ipcRenderer.invoke('open-zmx-dialog'),
   runConversion: (surfaceData, settings) => ipcRenderer.invoke('run-conversion', surfaceData, settings),
+  batchCalculateSurfaces: (surfaces) => ipcRenderer.invoke('batch-calculate-surfaces', surfaces),
   saveConversionResults: (folderName, surfaceName, results) => ipcRenderer.invoke('save-conversion-results', folderName, surfaceName, results),
   loadFolders: () => ipcRenderer.invoke('load-folders'),
   saveSurface: (folderName, surface) => ipcRenderer.invoke('save-surface', folderName, surface),
@@ -393,3 +393,49 @@ export const calculateSurfaceMetrics = (surface, wavelengthNm = 632.8) => {
         pvError
     };
 };
+
+/**
+ * Calculate metrics for many surfaces, using the Python batch engine when available
+ * Zernike/Irregular surfaces (which need the 2D RMS/P-V grid), surfaces the batch
+ * reports as errors, and all surfaces when Python cannot run fall back to
+ * calculateSurfaceMetrics()
+ * @param {Array} surfaces - Surface objects with type and parameters
+ * @param {number} wavelengthNm - Wavelength for RMS/P-V errors in waves
+ * @returns {Promise<Array>} Metrics objects in the same order as surfaces
+ */
+export const calculateSurfaceMetricsBatch = async (surfaces, wavelengthNm = 632.8) => {
+    const isRotational = (surface) => surface.type !== 'Zernike' && surface.type !== 'Irregular';
+    const batchSurfaces = surfaces.filter(isRotational);
+
+    let batchResults = [];
+    if (batchSurfaces.length > 0 && window.electronAPI && window.electronAPI.batchCalculateSurfaces) {
+        try {
+            const response = await window.electronAPI.batchCalculateSurfaces(
+                batchSurfaces.map(({ type, parameters }) => ({ type, parameters }))
+            );
+            if (response && response.success) {
+                batchResults = response.results;
+            } else {
+                console.warn('Batch calculation unavailable, using JS:', response && response.error);
+            }
+        } catch (error) {
+            console.warn('Batch calculation failed, using JS:', error);
+        }
+    }
+
+    const metrics = [];
+    let batchIndex = 0;
+    for (const surface of surfaces) {
+        const result = isRotational(surface) ? batchResults[batchIndex++] : null;
+        if (result && !result.error) {
+            metrics.push({ ...result, rmsError: null, pvError: null });
+        } else {
+            metrics.push(calculateSurfaceMetrics(surface, wavelengthNm));
+            // Yield between JS fallbacks so large batches do not freeze the UI
+            if (surfaces.length > 1) {
+                await new Promise(resolve => setTimeout(resolve, 0));
+            }
+        }
+    }
+    return metrics;
+};